@@ -14,7 +14,7 @@ DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_CONFIG = {
     'host': DB_HOST,
     'port': DB_PORT,
-    'database': DB_NAME,
+    'dbname': DB_NAME,
     'user': DB_USER,
     'password': DB_PASSWORD
 }
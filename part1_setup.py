@@ -3,6 +3,7 @@ Database and table setup for the job scraping.
 """
 
 import psycopg2
+from psycopg2 import sql
 import sys
 from config import DB_CONFIG, DB_HOST, DB_USER, DB_PASSWORD, DB_PORT
 
@@ -30,8 +31,8 @@ try:
     if cur.fetchone():
         print(f"Database '{DB_TO_CREATE}' already exists.")
     else:
-        # Create the database if it does not exist.
-        cur.execute(f"CREATE DATABASE {DB_TO_CREATE}")
+        # Create the database if it does not exist. The name is quoted as an identifier, not pasted into the SQL.
+        cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(DB_TO_CREATE)))
         print(f"Database '{DB_TO_CREATE}' created successfully.")
 
     cur.close()
@@ -69,12 +70,32 @@ try:
         salary_info TEXT,
         job_description TEXT,
         source_site VARCHAR(100),
-        scraped_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+        scraped_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+        claimed_at TIMESTAMPTZ
     );"""
 
     cur.execute(create_table_query)
+    # Tables created before claimed_at existed need the column added.
+    cur.execute("ALTER TABLE job_listings ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;")
     print("Table 'job_listings' is ready.")
 
+    # Partial index over the jobs still missing a description, already in id order.
+    # Its WHERE clause must stay identical to the one in part3's get_jobs_to_update.
+    create_index_query = """CREATE INDEX IF NOT EXISTS job_listings_needs_desc ON job_listings (id)
+        WHERE job_description IS NULL OR length(btrim(job_description)) = 0;"""
+
+    cur.execute(create_index_query)
+    print("Index 'job_listings_needs_desc' is ready.")
+
+    # UNLOGGED staging table for part2's COPY bulk loads. It only holds the scraped columns
+    # (no id default or constraints), and skipping WAL is fine because its rows are throwaway.
+    create_stage_query = """CREATE UNLOGGED TABLE IF NOT EXISTS job_listings_stage AS
+        SELECT job_title, company_name, location, job_url, salary_info, source_site
+        FROM job_listings WITH NO DATA;"""
+
+    cur.execute(create_stage_query)
+    print("Staging table 'job_listings_stage' is ready.")
+
     # Commit the transaction to make the changes permanent.
     conn.commit()
     cur.close()
@@ -3,52 +3,108 @@ Part 2: Robust Job Scraper for WeWorkRemotely
 Handles multiple HTML structures for job listings.
 """
 
+import asyncio
+import io
+from contextlib import asynccontextmanager
 import logging
-from typing import List, Dict, Optional
-from urllib.parse import urljoin
+from typing import AsyncIterator, List, Dict, Optional, Sequence, Tuple
+from urllib.parse import urljoin, urlsplit
 import sys
-import requests
-from bs4 import BeautifulSoup, Tag
+import time
+import aiohttp
+from lxml import etree
+from lxml.html import HtmlElement, HtmlElementClassLookup
+from cssselect import GenericTranslator
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from config import DB_CONFIG
 
 # --- Boilerplate Code (Logging and DatabaseManager Class) ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_css_translator = GenericTranslator()
+
+
+def _compile_css(selector: str) -> etree.XPath:
+    """Translates a CSS selector to XPath once and compiles it for reuse."""
+    return etree.XPath(_css_translator.css_to_xpath(selector))
+
+
+JOB_COLUMNS = ('job_title', 'company_name', 'location', 'job_url', 'salary_info', 'source_site')
+
+# Every row shares one interned source_site string.
+SOURCE_SITE = sys.intern('WeWorkRemotely')
+DEFAULT_LOCATION = 'Remote'
+
+# Statements built once from JOB_COLUMNS rather than on every insert.
+_COLUMN_LIST = ', '.join(JOB_COLUMNS)
+_UNNEST_INSERT_SQL = (f"INSERT INTO job_listings ({_COLUMN_LIST}) "
+                      f"SELECT * FROM unnest({', '.join(['%s::text[]'] * len(JOB_COLUMNS))}) "
+                      f"ON CONFLICT (job_url) DO NOTHING;")
+_COPY_STAGE_SQL = f"COPY job_listings_stage ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT text)"
+_STAGE_INSERT_SQL = (f"INSERT INTO job_listings ({_COLUMN_LIST}) SELECT {_COLUMN_LIST} FROM job_listings_stage "
+                     f"ON CONFLICT (job_url) DO NOTHING;")
+
+# A scraped job is one row of values in JOB_COLUMNS order. Batches are kept column-wise
+# (one list per column), which is the shape the unnest INSERT sends to PostgreSQL.
+JobRow = Tuple[Optional[str], ...]
+JobColumns = Sequence[List[Optional[str]]]
+
+# Characters that must be backslash-escaped in PostgreSQL's COPY text format.
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_escape(value: Optional[str]) -> str:
+    """Formats a single value for COPY ... FROM STDIN WITH (FORMAT text)."""
+    return '\\N' if value is None else str(value).translate(_COPY_ESCAPES)
+
+
+def create_pool(db_config: Dict, minconn: int = 2, maxconn: int = 16) -> ThreadedConnectionPool:
+    """Opens the connection pool shared by every thread that talks to the database."""
+    try:
+        pool = ThreadedConnectionPool(minconn=minconn, maxconn=maxconn, **db_config)
+        logger.info("Database connection pool established.")
+        return pool
+    except psycopg2.Error as e:
+        logger.error(f"Failed to connect to database: {e}")
+        sys.exit(1)
+
 
 class DatabaseManager:
-    """Manages the database connection and operations."""
+    """Checks a connection out of the pool for the duration of a block of operations."""
 
-    def __init__(self, db_config: Dict):
-        self.db_config = db_config
+    def __init__(self, pool: ThreadedConnectionPool):
+        self.pool = pool
         self.conn = None
 
     def __enter__(self):
         try:
-            self.conn = psycopg2.connect(**self.db_config)
-            logger.info("Database connection established.")
+            self.conn = self.pool.getconn()
             return self
         except psycopg2.Error as e:
-            logger.error(f"Failed to connect to database: {e}")
+            logger.error(f"Failed to get a database connection: {e}")
             sys.exit(1)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed.")
-
-    def bulk_insert_jobs(self, jobs: List[Dict]) -> int:
-        """Inserts a list of jobs using a fast, single transaction."""
-        if not jobs: return 0
-        job_tuples = [(j.get('job_title'), j.get('company_name'), j.get('location'),
-                       j.get('job_url'), j.get('salary_info'), j.get('source_site')) for j in jobs]
-        sql = "INSERT INTO job_listings (job_title, company_name, location, job_url, salary_info, source_site) VALUES %s ON CONFLICT (job_url) DO NOTHING;"
+            # The pool rolls back anything left uncommitted before reusing the connection.
+            self.pool.putconn(self.conn)
+            self.conn = None
+
+    # Batches at least this large are loaded with COPY; smaller ones with a single unnest INSERT.
+    COPY_THRESHOLD = 1000
+
+    def bulk_insert_jobs(self, columns: JobColumns) -> int:
+        """Inserts a column-wise batch of jobs using a fast, single transaction."""
+        row_count = len(columns[0])
+        if not row_count: return 0
         try:
             with self.conn.cursor() as cursor:
-                execute_values(cursor, sql, job_tuples)
-                count = cursor.rowcount
+                if row_count >= self.COPY_THRESHOLD:
+                    count = self._copy_jobs(cursor, columns)
+                else:
+                    count = self._unnest_jobs(cursor, columns)
                 self.conn.commit()
                 return count
         except psycopg2.Error as e:
@@ -56,111 +112,353 @@ class DatabaseManager:
             self.conn.rollback()
             return 0
 
+    def _unnest_jobs(self, cursor, columns: JobColumns) -> int:
+        """
+        Sends one array per column and lets PostgreSQL unnest them, so the
+        statement (and its planning cost) is the same size for any batch.
+        Returns the number of new rows.
+        """
+        cursor.execute(_UNNEST_INSERT_SQL, list(columns))
+        return cursor.rowcount
+
+    def _copy_jobs(self, cursor, columns: JobColumns) -> int:
+        """
+        Streams the jobs into the UNLOGGED job_listings_stage table (created by
+        part1_setup.py) with COPY, then moves the new rows across. Cheapest path
+        for large batches. Returns the number of new rows.
+        """
+        buffer = io.StringIO()
+        for row in zip(*columns):
+            buffer.write('\t'.join(map(_copy_escape, row)))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        # Don't wait for the WAL flush at commit: a lost batch can simply be scraped again.
+        cursor.execute("SET LOCAL synchronous_commit = off;")
+        # TRUNCATE locks the staging table until commit, so concurrent loads take turns.
+        cursor.execute("TRUNCATE job_listings_stage;")
+        cursor.copy_expert(_COPY_STAGE_SQL, buffer)
+        cursor.execute(_STAGE_INSERT_SQL)
+        count = cursor.rowcount
+        # Empty the stage again so the batch doesn't sit there until the next load.
+        cursor.execute("TRUNCATE job_listings_stage;")
+        return count
+
+
+class JobWriter:
+    """
+    Drains scraped job rows from a queue and inserts them in batches on a
+    worker thread, so database round-trips overlap with the next page fetches.
+    Each batch is collected straight into per-column lists. Full batches are
+    COPY_THRESHOLD rows, so they take the COPY path; partial batches flushed
+    when the scrapers go quiet use the unnest INSERT.
+    """
+
+    def __init__(self, pool: ThreadedConnectionPool, batch_size: int = DatabaseManager.COPY_THRESHOLD,
+                 flush_interval: float = 0.5):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.inserted_count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Sends the shutdown sentinel and waits for the last batch to be written."""
+        await self.queue.put(None)
+        await self._task
+
+    async def _run(self):
+        done = False
+        while not done:
+            row = await self.queue.get()
+            if row is None:
+                break
+            batch = tuple([value] for value in row)
+            size = 1
+            # Keep collecting until the batch is full or the scrapers go quiet.
+            while size < self.batch_size:
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    done = True
+                    break
+                for column, value in zip(batch, row):
+                    column.append(value)
+                size += 1
+            await self._flush(batch, size)
+
+    async def _flush(self, batch: JobColumns, size: int):
+        logger.info(f"Attempting to insert {size} jobs into the database...")
+        self.inserted_count += await asyncio.to_thread(self._insert, batch)
+
+    def _insert(self, batch: JobColumns) -> int:
+        """Runs on a worker thread with its own pooled connection."""
+        with DatabaseManager(self.pool) as db:
+            return db.bulk_insert_jobs(batch)
+
 
 # --- Job Scraper---
 class JobScraper:
-    """Scrapes job data using requests and BeautifulSoup."""
+    """Scrapes job data concurrently using aiohttp and lxml."""
+
+    MAX_CONCURRENCY = 64  # Concurrent requests allowed per host.
+    MAX_RETRIES = 5
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    CHUNK_SIZE = 65536  # Bytes fed to the incremental parser at a time.
+
+    # Each field is matched by one union selector covering the new and the standard listing format.
+    _SEL = {
+        'title': 'h4.new-listing__header__title, span.title',
+        'company': 'p.new-listing__company-name, span.company',
+        'location': 'p.new-listing__company-headquarters, span.region',
+    }
+
+    # Selectors are compiled once at import time instead of being re-parsed for every listing.
+    LINK_XP = _compile_css('a[href]')
+    TITLE_XP = _compile_css(_SEL['title'])
+    COMPANY_XP = _compile_css(_SEL['company'])
+    LOCATION_XP = _compile_css(_SEL['location'])
+    CATEGORIES_XP = _compile_css('div.new-listing__categories')
+    CATEGORY_XP = _compile_css('p.new-listing__categories__category')
 
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers = {
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
         self.base_url = "https://weworkremotely.com"
+        self.session = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_resume_at: Dict[str, float] = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit_per_host=self.MAX_CONCURRENCY, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=15))
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.session:
+            await self.session.close()
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        """Returns the semaphore bounding concurrent requests to a single host."""
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        return self._host_semaphores[host]
+
+    def _note_rate_limit(self, host: str, headers) -> Optional[float]:
+        """
+        Reads the X-RateLimit-* / Retry-After headers and, if the host asked us to
+        back off, records when requests to it may resume. Returns the delay, if any.
+        """
+        delay = None
+        if 'Retry-After' in headers:
+            try:
+                delay = float(headers['Retry-After'])
+            except ValueError:
+                pass
+        elif headers.get('X-RateLimit-Remaining') == '0':
+            try:
+                reset = float(headers.get('X-RateLimit-Reset', 1))
+            except ValueError:
+                reset = 1.0
+            # The reset header is either seconds-to-wait or an epoch timestamp.
+            delay = reset if reset < 10 ** 9 else max(0.0, reset - time.time())
+
+        if delay is not None:
+            self._host_resume_at[host] = asyncio.get_running_loop().time() + delay
+        return delay
 
-    def _extract_text(self, soup_item: Tag, selector: str) -> Optional[str]:
-        """Safely extracts text from an element found by a CSS selector."""
-        element = soup_item.select_one(selector)
-        return element.get_text(strip=True) if element else None
+    async def _wait_for_host(self, host: str):
+        """Sleeps until a rate-limited host is accepting requests again."""
+        resume_at = self._host_resume_at.get(host)
+        if resume_at:
+            delay = resume_at - asyncio.get_running_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
 
-    def _find_salary(self, soup_item: Tag) -> Optional[str]:
+    @asynccontextmanager
+    async def _get(self, url: str) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Opens a successful response for a URL, retrying rate-limited and
+        transient failures with exponential backoff. The body is left unread
+        so the caller can stream it.
+        """
+        host = urlsplit(url).netloc
+        async with self._host_semaphore(host):
+            for attempt in range(self.MAX_RETRIES):
+                await self._wait_for_host(host)
+                async with self.session.get(url) as response:
+                    delay = self._note_rate_limit(host, response.headers)
+                    if response.status not in self.RETRY_STATUSES:
+                        response.raise_for_status()
+                        yield response
+                        return
+
+                if attempt == self.MAX_RETRIES - 1:
+                    break  # No retry is coming, so don't wait for one.
+                backoff = max(delay or 0, 2 ** attempt)
+                logger.warning(f"{url} returned HTTP {response.status}; retrying in {backoff:.0f}s "
+                               f"(attempt {attempt + 1}/{self.MAX_RETRIES}).")
+                await asyncio.sleep(backoff)
+
+        raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                          status=response.status, message="Retries exhausted")
+
+    def _first_text(self, item: HtmlElement, xpath: etree.XPath) -> Optional[str]:
+        """Returns the stripped text of the first element matched by a compiled selector."""
+        elements = xpath(item)
+        return (elements[0].text_content().strip() or None) if elements else None
+
+    def _find_salary(self, item: HtmlElement) -> Optional[str]:
         """Specifically looks for salary information in the new listing format."""
-        categories_div = soup_item.select_one('div.new-listing__categories')
+        categories_div = self.CATEGORIES_XP(item)
         if not categories_div:
             return None
 
-        for category in categories_div.select('p.new-listing__categories__category'):
-            text = category.get_text()
+        for category in self.CATEGORY_XP(categories_div[0]):
+            text = category.text_content()
             if '$' in text or 'USD' in text:
                 return text.strip()
         return None
 
-    def _find_job_link(self, soup_item: Tag) -> Optional[str]:
+    def _find_job_link(self, item: HtmlElement) -> Optional[str]:
         """
         Finds the correct job post link by searching for a URL containing '/remote-jobs/'.
         """
-        all_links = soup_item.find_all('a', href=True)
+        all_links = self.LINK_XP(item)
         for link in all_links: #filter the job specific links from multiple links
-            if '/remote-jobs/' in link['href']:
-                return link['href']
+            href = link.get('href')
+            if '/remote-jobs/' in href:
+                return href
         return None
 
-    def scrape_weworkremotely(self, url: str) -> List[Dict]:
+    def _parse_listing(self, item: HtmlElement) -> Optional[JobRow]:
+        """Extracts one job row from a listing <li>, or None if it isn't a complete job post."""
+        # Use the new, more reliable method to find the job URL
+        job_path = self._find_job_link(item)
+        if not job_path:
+            return None  # Skip if no valid job link is found
+
+        job_url = urljoin(self.base_url, job_path)
+
+        # Extract other data using the robust multi-selector approach
+        job_title = self._first_text(item, self.TITLE_XP)
+        company = self._first_text(item, self.COMPANY_XP)
+        location = self._first_text(item, self.LOCATION_XP)
+        salary = self._find_salary(item)
+
+        if not (job_title and company):
+            return None
+        # Values in JOB_COLUMNS order.
+        return job_title, company, location or DEFAULT_LOCATION, job_url, salary, SOURCE_SITE
+
+    def _is_job_list_item(self, item: HtmlElement) -> bool:
+        """Equivalent of the 'section#category-2 li' selector for an element still being parsed."""
+        return any(section.get('id') == 'category-2' for section in item.iterancestors('section'))
+
+    def _release(self, item: HtmlElement):
+        """
+        Frees a finished top-level listing and the listings before it, so only
+        the <li> currently being parsed is kept in memory. Nested <li>s are left
+        for their enclosing listing to handle.
+        """
+        if next(item.iterancestors('li'), None) is not None:
+            return
+        item.clear(keep_tail=False)
+        while item.getprevious() is not None:
+            del item.getparent()[0]
+
+    async def scrape_weworkremotely(self, url: str, job_queue: asyncio.Queue) -> int:
         """
         Scrapes all job listings, handling both standard and "new" HTML formats.
+        The page is parsed incrementally as it downloads and each job is put on
+        `job_queue` as soon as its <li> closes; returns the number found.
         """
-        all_jobs = []
+        found = 0
+        list_items = 0
         logger.info(f"Scraping jobs from: {url}")
 
+        def handle_events():
+            nonlocal found, list_items
+            for _, item in parser.read_events():
+                if not self._is_job_list_item(item):
+                    continue
+                list_items += 1
+                job = self._parse_listing(item)
+                if job:
+                    found += 1
+                    job_queue.put_nowait(job)
+                self._release(item)
+
         try:
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            job_listings = soup.select('section#category-2 li')
-            logger.info(f"Found {len(job_listings)} total job list items.")
-
-            for item in job_listings:
-                # Use the new, more reliable method to find the job URL
-                job_path = self._find_job_link(item)
-                if not job_path:
-                    continue  # Skip if no valid job link is found
-
-                job_url = urljoin(self.base_url, job_path)
-
-                # Extract other data using the robust multi-selector approach
-                job_title = self._extract_text(item, 'h4.new-listing__header__title') or self._extract_text(item,
-                                                                                                            'span.title')
-                company = self._extract_text(item, 'p.new-listing__company-name') or self._extract_text(item,
-                                                                                                        'span.company')
-                location = self._extract_text(item, 'p.new-listing__company-headquarters') or self._extract_text(item,
-                                                                                                                 'span.region')
-                salary = self._find_salary(item)
-
-                if job_title and company:
-                    all_jobs.append({
-                        'job_title': job_title,
-                        'company_name': company,
-                        'location': location or "Remote",
-                        'job_url': job_url,
-                        'salary_info': salary,
-                        'source_site': 'WeWorkRemotely'
-                    })
-
-        except requests.RequestException as e:
+            async with self._get(url) as response:
+                # Decode with the charset from Content-Type rather than letting libxml2 guess.
+                parser = etree.HTMLPullParser(events=('end',), tag='li', encoding=response.charset or 'utf-8')
+                parser.set_element_class_lookup(HtmlElementClassLookup())
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    parser.feed(chunk)
+                    handle_events()
+                parser.close()
+                handle_events()
+            logger.info(f"Found {list_items} total job list items.")
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Request to {url} failed: {e}")
 
-        return all_jobs
+        return found
+
+    async def scrape_all(self, urls: Sequence[str], job_queue: asyncio.Queue) -> int:
+        """Scrapes several listing pages concurrently, feeding every job into one queue."""
+        results = await asyncio.gather(*(self.scrape_weworkremotely(url, job_queue) for url in urls))
+        return sum(results)
+
+
+async def scrape_jobs(urls: Sequence[str], pool: ThreadedConnectionPool) -> Tuple[int, int]:
+    """
+    Scrapes every URL over a shared HTTP session while a JobWriter inserts the
+    results. Returns the number of jobs found and the number newly inserted.
+    """
+    writer = JobWriter(pool)
+    writer.start()
+    try:
+        async with JobScraper() as scraper:
+            found = await scraper.scrape_all(urls, writer.queue)
+    finally:
+        await writer.close()
+    return found, writer.inserted_count
+
+
 def main():
     """Main function to run the scraping and insertion process."""
 
-    target_url = "https://weworkremotely.com/categories/remote-full-stack-programming-jobs"
-    scraper = JobScraper()
+    # Add further category/page URLs here; they are fetched concurrently.
+    target_urls = [
+        "https://weworkremotely.com/categories/remote-full-stack-programming-jobs",
+    ]
 
-    with DatabaseManager(DB_CONFIG) as db:
-        jobs_to_insert = scraper.scrape_weworkremotely(target_url)
-        if not jobs_to_insert:
-            logger.warning("No jobs were found.")
-            return
+    pool = create_pool(DB_CONFIG)
+    try:
+        jobs_found, inserted_count = asyncio.run(scrape_jobs(target_urls, pool))
+    finally:
+        pool.closeall()
+        logger.info("Database connection pool closed.")
 
-        logger.info(f"Attempting to insert {len(jobs_to_insert)} jobs into the database...")
-        inserted_count = db.bulk_insert_jobs(jobs_to_insert)
+    if not jobs_found:
+        logger.warning("No jobs were found.")
+        return
 
-        print("\n" + "=" * 60)
-        print("JOB SCRAPING COMPLETED!")
-        print("=" * 60)
-        print(f"Jobs found on page: {len(jobs_to_insert)}")
-        print(f"New jobs inserted into database: {inserted_count}")
-        print("=" * 60)
+    print("\n" + "=" * 60)
+    print("JOB SCRAPING COMPLETED!")
+    print("=" * 60)
+    print(f"Jobs found on pages: {jobs_found}")
+    print(f"New jobs inserted into database: {inserted_count}")
+    print("=" * 60)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,34 @@
 #!/usr/bin/env python3
 """
-Part 3: Scraping Job Descriptions with Selenium (Refactored)
+Part 3: Scraping Job Descriptions (Refactored)
 
-This script reads job entries from a PostgreSQL database, navigates to each
+This script reads job entries from a PostgreSQL database, fetches each
 job's detail page, scrapes the full job description based on a configurable
 selector, and updates the database record.
+
+Detail pages are server-rendered, so descriptions are read from the static
+HTML with requests and lxml. Selenium is only started for pages where the
+static parse comes back empty.
 """
 
 import logging
+import queue
 import sys
+import threading
 import time
 import os
-from typing import List, Dict
+from contextlib import ExitStack
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
+from lxml import etree
+from cssselect import GenericTranslator
 
 # Selenium imports
 from selenium import webdriver
@@ -25,70 +42,354 @@ from selenium.common.exceptions import TimeoutException
 from config import DB_CONFIG
 
 # Database imports
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, PoolTimeout
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+def create_pool(db_config: Dict, minconn: int = 2, maxconn: int = 16) -> ConnectionPool:
+    """Opens the connection pool shared by the main thread and the description writer."""
+    pool = ConnectionPool(kwargs=db_config, min_size=minconn, max_size=maxconn, open=True)
+    try:
+        pool.wait(timeout=30)
+        return pool
+    except PoolTimeout as e:
+        pool.close()
+        logging.error(f"Failed to connect to database: {e}")
+        sys.exit(1)
+
+
 class DatabaseManager:
-    """Manages all database interactions for this script."""
+    """Manages all database interactions for this script over a pooled connection."""
 
-    def __init__(self, db_config: Dict):
-        self.db_config = db_config
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
         self.conn = None
 
     def __enter__(self):
         try:
-            self.conn = psycopg2.connect(**self.db_config)
+            self.conn = self.pool.getconn()
             return self
-        except psycopg2.Error as e:
-            logging.error(f"Failed to connect to database: {e}")
+        except (psycopg.Error, PoolTimeout) as e:
+            logging.error(f"Failed to get a database connection: {e}")
             sys.exit(1)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.conn:
-            self.conn.close()
+            # The pool rolls back anything left uncommitted before reusing the connection.
+            self.pool.putconn(self.conn)
+            self.conn = None
 
 
-    def get_jobs_to_update(self, limit: int = None) -> List[Dict]:
+    def get_jobs_to_update(self, limit: int = None, claim_timeout: str = '30 minutes') -> List[Dict]:
         """
-        Fetches jobs that have a NULL or an empty string description.
+        Claims jobs that have a NULL or an empty string description, so that
+        concurrent runs each get a disjoint set of rows. Rows locked by another
+        run are skipped; claims older than `claim_timeout` are treated as
+        abandoned and can be claimed again.
         """
-        # This query finds both NULLs and empty strings.
-        query = "SELECT id, job_url FROM job_listings WHERE job_description IS NULL OR trim(job_description) = '' ORDER BY id"
-
-        if limit:
-            query += f" LIMIT {limit}"
-        query += ";"
+        # This query finds both NULLs and empty strings. The predicate matches the partial index
+        # job_listings_needs_desc from part1_setup.py, so it can be served from that index. LIMIT NULL means no limit.
+        query = """
+            UPDATE job_listings SET claimed_at = now()
+            WHERE id IN (
+                SELECT id FROM job_listings
+                WHERE (job_description IS NULL OR length(btrim(job_description)) = 0)
+                  AND (claimed_at IS NULL OR claimed_at < now() - %s::interval)
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, job_url;"""
+
+        with self.conn.cursor(row_factory=dict_row) as cursor:
+            cursor.execute(query, (claim_timeout, limit))
+            jobs = cursor.fetchall()
+        self.conn.commit()
+        return sorted(jobs, key=lambda job: job['id'])
 
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(query)
-            return cursor.fetchall()
+    def release_claims(self, job_ids: List[int]):
+        """Releases claimed jobs that could not be scraped so the next run retries them."""
+        if not job_ids:
+            return
+        with self.conn.cursor() as cursor:
+            cursor.execute("UPDATE job_listings SET claimed_at = NULL WHERE id = ANY(%s);", (job_ids,))
+        self.conn.commit()
 
-    def update_description(self, job_id: int, description: str):
-        """Updates a specific job row with the scraped description."""
+    def update_descriptions_bulk(self, updates: List[Tuple[int, str]]) -> int:
+        """
+        Updates a batch of (job_id, description) pairs in pipeline mode: every
+        UPDATE is sent without waiting for the previous result, so the whole
+        batch costs about one round-trip. The caller commits.
+        """
+        if not updates:
+            return 0
         update_sql = "UPDATE job_listings SET job_description = %s WHERE id = %s;"
         with self.conn.cursor() as cursor:
-            cursor.execute(update_sql, (description, job_id))
-        self.conn.commit()
+            with self.conn.pipeline():
+                cursor.executemany(update_sql, [(description, job_id) for job_id, description in updates])
+            # Row counts are only known once the pipeline has synced.
+            return cursor.rowcount
+
+
+class DescriptionWriter(threading.Thread):
+    """
+    Drains scraped (job_id, description) pairs from a queue and writes them to
+    the database in batches, so scraping threads never wait on the database.
+    Batches share a transaction that is committed every `commit_every` rows;
+    a pooled connection is held only while such a transaction is open.
+    Jobs whose updates are lost to a rollback are collected in `discarded_ids`.
+    """
+
+    def __init__(self, pool: ConnectionPool, batch_size: int = 50, commit_every: int = 100):
+        super().__init__(name="description-writer", daemon=True)
+        self.pool = pool
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.results: queue.Queue = queue.Queue()
+        self.updated_count = 0
+        self.discarded_ids: List[int] = []
+        self._uncommitted = 0
+        self._uncommitted_ids: List[int] = []
+        self._transaction = ExitStack()
+        self._db: Optional[DatabaseManager] = None
+
+    def run(self):
+        batch = []
+        while True:
+            item = self.results.get()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+        self._commit()
+
+    def _flush(self, batch: List[Tuple[int, str]]):
+        if not batch:
+            return
+        try:
+            self._uncommitted += self._connection().update_descriptions_bulk(batch)
+            logging.info(f"Wrote {len(batch)} descriptions to the database.")
+        except psycopg.Error as e:
+            self._rollback(e, [job_id for job_id, _ in batch])
+            return
+        self._uncommitted_ids.extend(job_id for job_id, _ in batch)
+        if self._uncommitted >= self.commit_every:
+            self._commit()
+
+    def _connection(self) -> DatabaseManager:
+        """Checks out a connection for the current transaction, if one isn't held already."""
+        if self._db is None:
+            self._db = self._transaction.enter_context(DatabaseManager(self.pool))
+        return self._db
+
+    def _release(self):
+        self._transaction.close()
+        self._db = None
+
+    def _commit(self):
+        if self._db is None:
+            return
+        try:
+            self._db.conn.commit()
+        except psycopg.Error as e:
+            self._rollback(e)
+            return
+        self.updated_count += self._uncommitted
+        self._uncommitted = 0
+        self._uncommitted_ids = []
+        self._release()
+
+    def _rollback(self, error: psycopg.Error, failed_ids: Optional[List[int]] = None):
+        discarded = self._uncommitted_ids + (failed_ids or [])
+        logging.error(f"Database batch update error, discarding {len(discarded)} uncommitted updates: {error}")
+        if self._db is not None:
+            self._db.conn.rollback()
+            self._release()
+        self.discarded_ids.extend(discarded)
+        self._uncommitted = 0
+        self._uncommitted_ids = []
+
+    def close(self):
+        """Signals the writer to flush what is left and waits for it to finish."""
+        self.results.put(None)
+        self.join()
+
+
+class DriverPool:
+    """
+    Hands out headless WebDrivers to worker threads. Drivers are only launched
+    the first time one is needed, up to `size` of them.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: queue.Queue = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle.empty() and len(self._drivers) < self.size:
+                driver = setup_driver()
+                self._drivers.append(driver)
+                return driver
+        return self._idle.get()
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    def close(self):
+        if self._drivers:
+            logging.info("Closing WebDrivers...")
+        for driver in self._drivers:
+            driver.quit()
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every worker. Requests run at up to `rate` per
+    second (with short bursts of `burst`); the rate creeps up while the server
+    accepts requests, and is halved, with a pause, whenever the server answers
+    HTTP 429 or reports X-RateLimit-Remaining: 0.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 4, min_rate: float = 0.1, max_rate: float = 20.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                    self._last_refill = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def observe(self, response: requests.Response):
+        """Adjusts the rate from a response's status and rate-limit headers."""
+        limited = response.status_code == 429 or response.headers.get('X-RateLimit-Remaining') == '0'
+        with self._lock:
+            if not limited:
+                self.rate = min(self.max_rate, self.rate + 0.1)
+                return
+            delay = self._retry_after(response)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._tokens = 0.0
+            self.rate = max(self.min_rate, self.rate / 2)
+        logging.warning(f"Rate limited by the server; pausing {delay:.0f}s and slowing to {self.rate:.2f} req/s.")
+
+    def _retry_after(self, response: requests.Response) -> float:
+        """Seconds to wait, from Retry-After (seconds or HTTP date) or X-RateLimit-Reset."""
+        value = response.headers.get('Retry-After') or response.headers.get('X-RateLimit-Reset')
+        if value:
+            try:
+                seconds = float(value)
+                # X-RateLimit-Reset is sometimes an epoch timestamp rather than a delay.
+                return max(0.0, seconds - time.time()) if seconds > 10 ** 9 else seconds
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        return 1 / self.rate
+
+
+def create_session() -> requests.Session:
+    """
+    Creates the keep-alive HTTP session used for static page fetches. The
+    mounted adapter keeps a connection pool large enough for every worker and
+    retries transient failures. HTTP 429 is left to the RateLimiter.
+    """
+    session = requests.Session()
+    # urllib3 would otherwise retry a 429 with Retry-After itself, out of the limiter's sight.
+    retries = Retry(total=5, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504],
+                    respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
+    return session
+
+
+# One keep-alive session shared by every worker, so TLS connections are reused across pages.
+SESSION = create_session()
+
+# Paces every page load, static or in the browser, against the server's actual limits.
+LIMITER = RateLimiter()
+
+# How often a static fetch is retried after the server answers HTTP 429.
+RATE_LIMIT_RETRIES = 3
+
+
+@lru_cache(maxsize=None)
+def compile_selector(selector: str) -> etree.XPath:
+    """Translates a CSS selector to XPath once and compiles it for reuse."""
+    return etree.XPath(GenericTranslator().css_to_xpath(selector))
+
+
+def fetch_static_description(url: str, selector: str) -> Optional[str]:
+    """
+    Fetches a job detail page without a browser and extracts the description
+    from the server-rendered HTML. Returns None if the element is not present;
+    raises requests.RequestException if the page could not be fetched, including
+    when it is still rate limited after RATE_LIMIT_RETRIES retries.
+    """
+    for _ in range(RATE_LIMIT_RETRIES + 1):
+        LIMITER.acquire()
+        response = SESSION.get(url, timeout=15)
+        LIMITER.observe(response)
+        if response.status_code != 429:
+            break
+    response.raise_for_status()
+    try:
+        # requests assumes ISO-8859-1 for text/* without a charset; leave those to the page's meta tag.
+        has_charset = 'charset' in response.headers.get('Content-Type', '').lower()
+        parser = lxml.html.HTMLParser(encoding=response.encoding if has_charset else None)
+        elements = compile_selector(selector)(lxml.html.fromstring(response.content, parser=parser))
+        if elements:
+            return elements[0].text_content().strip() or None
+    except etree.ParserError as e:
+        logging.warning(f"Static HTML of {url} could not be parsed: {e}")
+    return None
 
 
 def setup_driver():
     """Set up and return a headless Selenium Firefox WebDriver."""
     options = FirefoxOptions()
-    options.headless = True
+    options.add_argument("-headless")
     driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
     return driver
 
 
-def scrape_full_description(driver, url: str, selector: str) -> str | None:
+def scrape_with_driver(driver, url: str, selector: str) -> str | None:
     """
-    Navigates to a job detail URL and extracts the full description text
-    using a provided CSS selector.
+    Navigates to a job detail URL in the browser and extracts the full
+    description text using a provided CSS selector.
     """
     try:
+        LIMITER.acquire()
         driver.get(url)
         wait = WebDriverWait(driver, 15)
         description_element = wait.until(
@@ -103,6 +404,29 @@ def scrape_full_description(driver, url: str, selector: str) -> str | None:
         return None
 
 
+def scrape_full_description(drivers: DriverPool, url: str, selector: str, try_static: bool = True) -> str | None:
+    """
+    Extracts the full description for a job, reading the static HTML over the
+    shared session first and only loading the page in a browser when the
+    selector is absent from it. A page that could not be fetched is not retried
+    in the browser, which would only hit the same failure or rate limit.
+    """
+    if try_static:
+        try:
+            description = fetch_static_description(url, selector)
+        except requests.RequestException as e:
+            logging.warning(f"Static fetch of {url} failed: {e}")
+            return None
+        if description:
+            return description
+
+    driver = drivers.acquire()
+    try:
+        return scrape_with_driver(driver, url, selector)
+    finally:
+        drivers.release(driver)
+
+
 def main():
     """Main function to run the description scraping process."""
 
@@ -112,45 +436,85 @@ def main():
 
     # Set a limit for testing, or set to None to run on all jobs.
     JOB_LIMIT = None
+
+    # Number of jobs scraped in parallel (and the most headless browsers started).
+    # Request pacing is handled by LIMITER.
+    WORKER_COUNT = 4
+
+    # Number of jobs tried when probing whether descriptions are in the static HTML.
+    PROBE_ATTEMPTS = 3
     # --- End of Configuration ---
 
-    with DatabaseManager(DB_CONFIG) as db:
-        jobs_to_update = db.get_jobs_to_update(JOB_LIMIT)
+    pool = create_pool(DB_CONFIG)
+    try:
+        with DatabaseManager(pool) as db:
+            jobs_to_update = db.get_jobs_to_update(JOB_LIMIT)
 
         if not jobs_to_update:
             logging.info("All jobs in the database already have a description. No work to do.")
             return
 
-        logging.info(f"Found {len(jobs_to_update)} jobs to process. Initializing scraper...")
-        driver = setup_driver()
-        updated_count = 0
-
+        worker_count = min(WORKER_COUNT, len(jobs_to_update))
+        logging.info(f"Found {len(jobs_to_update)} jobs to process. Initializing {worker_count} scrapers...")
+        drivers = DriverPool(worker_count)
+        writer = DescriptionWriter(pool)
+
+        # Probe one page: if the description is in the static HTML, skip the browser for all jobs.
+        # A failed fetch says nothing about the HTML, so move on to the next job.
+        use_static = None
+        for job in jobs_to_update[:PROBE_ATTEMPTS]:
+            try:
+                use_static = fetch_static_description(job['job_url'], DESCRIPTION_SELECTOR) is not None
+                break
+            except requests.RequestException as e:
+                logging.warning(f"Probe fetch of {job['job_url']} failed: {e}")
+        if use_static is None:
+            use_static = True
+            logging.info("Could not probe the static HTML; trying requests first with Selenium as fallback.")
+        elif use_static:
+            logging.info("Descriptions are present in the static HTML; using requests with Selenium as fallback.")
+        else:
+            logging.info("Descriptions are not in the static HTML; using Selenium.")
+
+        def process_job(job: Dict) -> bool:
+            """Scrapes one job, statically if possible, and queues the result."""
+            description = scrape_full_description(drivers, job['job_url'], DESCRIPTION_SELECTOR, use_static)
+
+            if description:
+                writer.results.put((job['id'], description))
+                return True
+            return False
+
+        failed_ids = []
+        writer.start()
         try:
-            for i, job in enumerate(jobs_to_update, 1):
-                logging.info(f"[{i}/{len(jobs_to_update)}] Processing Job ID: {job['id']}")
-                # Pass the selector from the config to the scraping function
-                description = scrape_full_description(driver, job['job_url'], DESCRIPTION_SELECTOR)
-
-                if description:
-                    db.update_description(job['id'], description)
-                    logging.info(f"Successfully updated Job ID: {job['id']}")
-                    updated_count += 1
-                else:
-                    logging.warning(f"Skipping update for Job ID: {job['id']} due to missing description.")
-
-                time.sleep(2)
+            with ThreadPoolExecutor(max_workers=worker_count) as executor:
+                futures = {executor.submit(process_job, job): job for job in jobs_to_update}
+                for i, future in enumerate(as_completed(futures), 1):
+                    job = futures[future]
+                    if future.result():
+                        logging.info(f"[{i}/{len(jobs_to_update)}] Scraped Job ID: {job['id']}")
+                    else:
+                        failed_ids.append(job['id'])
+                        logging.warning(f"[{i}/{len(jobs_to_update)}] Skipping update for Job ID: {job['id']} "
+                                        f"due to missing description.")
         finally:
-            logging.info("Closing WebDriver...")
-            driver.quit()
+            writer.close()
+            drivers.close()
+            with DatabaseManager(pool) as db:
+                # Jobs that were scraped but whose updates were rolled back are retried too.
+                db.release_claims(failed_ids + writer.discarded_ids)
 
         # --- Final Summary ---
         print("\n" + "=" * 60)
         print("DESCRIPTION SCRAPING COMPLETED!")
         print("=" * 60)
         print(f"Jobs processed: {len(jobs_to_update)}")
-        print(f"Successfully updated: {updated_count}")
+        print(f"Successfully updated: {writer.updated_count}")
         print("=" * 60)
+    finally:
+        pool.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()